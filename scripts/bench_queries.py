@@ -13,6 +13,13 @@ import os
 import sys
 import time
 import csv
+import statistics
+import math
+import shutil
+import subprocess
+import urllib.request
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Handle pandas import gracefully
@@ -23,6 +30,83 @@ except ImportError:
     HAS_PANDAS = False
     print("⚠️  pandas not available - will use basic CSV output")
 
+# Benchmark scenarios, in the order they are run and reported
+SCENARIOS = ["csv_uncached", "csv_cached", "parquet_uncached", "parquet_cached"]
+
+# Parquet copy of the CSV, written once by ensure_parquet and reused across runs
+PARQUET_PATH = "_parquet_cache/home_sales.parquet"
+
+# Realistic home sales analysis queries, shared by warm-up and timed runs
+QUERIES = {
+    "avg_price_4bed_by_year": """
+        SELECT date_built, ROUND(AVG(price), 2) as avg_price
+        FROM home_sales 
+        WHERE bedrooms = 4 
+        GROUP BY date_built 
+        ORDER BY date_built
+    """,
+    
+    "avg_price_3bed_3bath_by_year": """
+        SELECT date_built, ROUND(AVG(price), 2) as avg_price
+        FROM home_sales 
+        WHERE bedrooms = 3 AND bathrooms = 3 
+        GROUP BY date_built 
+        ORDER BY date_built
+    """,
+    
+    "avg_price_luxury_homes": """
+        SELECT date_built, ROUND(AVG(price), 2) as avg_price
+        FROM home_sales 
+        WHERE bedrooms = 3 AND bathrooms = 3 AND floors = 2 AND sqft_living >= 2000
+        GROUP BY date_built 
+        ORDER BY date_built
+    """,
+    
+    "avg_price_by_view_rating": """
+        SELECT view, ROUND(AVG(price), 2) as avg_price
+        FROM home_sales 
+        WHERE price >= 350000
+        GROUP BY view 
+        ORDER BY view DESC
+    """
+}
+
+# Single-scan rewrite of the three date_built queries using conditional
+# aggregates; the view query groups differently and is run unchanged
+FUSED_QUERIES = {
+    "avg_price_by_year_fused": """
+        SELECT date_built,
+               ROUND(AVG(CASE WHEN bedrooms = 4 THEN price END), 2) as avg_price_4bed,
+               ROUND(AVG(CASE WHEN bedrooms = 3 AND bathrooms = 3 THEN price END), 2) as avg_price_3bed_3bath,
+               ROUND(AVG(CASE WHEN bedrooms = 3 AND bathrooms = 3 AND floors = 2 AND sqft_living >= 2000
+                              THEN price END), 2) as avg_price_luxury
+        FROM home_sales 
+        WHERE bedrooms = 4 OR (bedrooms = 3 AND bathrooms = 3)
+        GROUP BY date_built 
+        ORDER BY date_built
+    """,
+    
+    "avg_price_by_view_rating": QUERIES["avg_price_by_view_rating"]
+}
+
+# Result column holding the wall-clock time of the fused query set
+FUSED_KEY = "fused"
+
+# Result column holding the wall-clock time of one pass over the concurrent queries
+WALL_KEY = "wall_clock"
+
+def bench_iterations():
+    """Number of timed runs per query, from BENCH_ITERS (default 5)"""
+    value = os.environ.get("BENCH_ITERS", "5")
+    try:
+        iterations = int(value)
+    except ValueError:
+        iterations = 0
+    if iterations < 1:
+        print(f"❌ BENCH_ITERS must be a positive integer, got {value!r}")
+        sys.exit(1)
+    return iterations
+
 def find_csv_file():
     """Auto-detect CSV file location with multiple fallback strategies"""
     
@@ -47,22 +131,25 @@ def find_csv_file():
     
     # Strategy 3: Download from AWS S3 (same URL as notebook)
     print("📥 CSV not found locally, downloading from AWS S3...")
+    url = "https://2u-data-curriculum-team.s3.amazonaws.com/dataviz-classroom/v1.2/22-big-data/home_sales_revised.csv"
+    csv_path = "data/home_sales_revised.csv"
+    tmp_path = csv_path + ".part"
     try:
-        from pyspark import SparkFiles
-        from pyspark.sql import SparkSession
-        
-        # Create minimal Spark session for download
-        spark = SparkSession.builder.appName("CSVDownload").getOrCreate()
-        url = "https://2u-data-curriculum-team.s3.amazonaws.com/dataviz-classroom/v1.2/22-big-data/home_sales_revised.csv"
-        spark.sparkContext.addFile(url)
-        csv_path = SparkFiles.get("home_sales_revised.csv")
+        # Stream straight to disk; later runs pick this file up via strategy 2
+        os.makedirs("data", exist_ok=True)
+        with urllib.request.urlopen(url, timeout=60) as response, \
+                open(tmp_path, "wb", buffering=1 << 20) as f:
+            shutil.copyfileobj(response, f, length=1 << 20)
+        os.replace(tmp_path, csv_path)
         
-        if os.path.exists(csv_path):
-            print(f"📁 Downloaded CSV to: {csv_path}")
-            return csv_path
+        print(f"📁 Downloaded CSV to: {csv_path}")
+        return csv_path
             
     except Exception as e:
         print(f"❌ Failed to download CSV: {e}")
+        # Don't leave a partial download behind
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
     
     # Strategy 4: Fallback error
     print("❌ Could not locate home_sales_revised.csv")
@@ -80,6 +167,16 @@ def setup_spark():
             .appName("HomeSalesBenchmark") \
             .config("spark.sql.adaptive.enabled", "true") \
             .config("spark.sql.adaptive.coalescePartitions.enabled", "true") \
+            .config("spark.sql.adaptive.advisoryPartitionSizeInBytes", "8MB") \
+            .config("spark.sql.shuffle.partitions", "8") \
+            .config("spark.sql.inMemoryColumnarStorage.batchSize", "20000") \
+            .config("spark.sql.inMemoryColumnarStorage.compressed", "true") \
+            .config("spark.sql.autoBroadcastJoinThreshold", "10MB") \
+            .config("spark.sql.codegen.wholeStage", "true") \
+            .config("spark.scheduler.mode", "FAIR") \
+            .config("spark.memory.offHeap.enabled", "true") \
+            .config("spark.memory.offHeap.size", "2g") \
+            .config("spark.sql.columnVector.offheap.enabled", "true") \
             .getOrCreate()
             
         return spark, col, avg, count, spark_round
@@ -94,147 +191,460 @@ def load_data(spark, csv_path):
     """Load CSV data into Spark DataFrame"""
     print(f"📊 Loading data from {csv_path}...")
     
-    df = spark.read.csv(csv_path, sep=",", header=True, inferSchema=True)
-    row_count = df.count()
-    print(f"✅ Loaded {row_count:,} rows")
+    from pyspark.sql.types import (
+        StructType, StructField, StringType, IntegerType, DoubleType
+    )
+
+    # Explicit schema avoids the extra full pass inferSchema makes over the file
+    schema = StructType([
+        StructField("id", StringType()),
+        StructField("date", StringType()),
+        StructField("date_built", IntegerType()),
+        StructField("price", DoubleType()),
+        StructField("bedrooms", IntegerType()),
+        StructField("bathrooms", IntegerType()),
+        StructField("sqft_living", IntegerType()),
+        StructField("sqft_lot", IntegerType()),
+        StructField("floors", IntegerType()),
+        StructField("waterfront", IntegerType()),
+        StructField("view", IntegerType()),
+    ])
+
+    df = spark.read.schema(schema).csv(csv_path, sep=",", header=True)
+
+    # Counting rows forces a full scan, so only do it when asked
+    if os.environ.get("BENCH_VERBOSE"):
+        row_count = df.count()
+        print(f"✅ Loaded {row_count:,} rows")
+    else:
+        print("✅ Data source registered")
     
     # Create temporary view
     df.createOrReplaceTempView("home_sales")
     return df
 
-def run_benchmark_queries(spark, col, avg, count, spark_round):
-    """Run realistic home sales analysis queries"""
-    
-    queries = {
-        "avg_price_4bed_by_year": """
-            SELECT date_built, ROUND(AVG(price), 2) as avg_price
-            FROM home_sales 
-            WHERE bedrooms = 4 
-            GROUP BY date_built 
-            ORDER BY date_built
-        """,
-        
-        "avg_price_3bed_3bath_by_year": """
-            SELECT date_built, ROUND(AVG(price), 2) as avg_price
-            FROM home_sales 
-            WHERE bedrooms = 3 AND bathrooms = 3 
-            GROUP BY date_built 
-            ORDER BY date_built
-        """,
-        
-        "avg_price_luxury_homes": """
-            SELECT date_built, ROUND(AVG(price), 2) as avg_price
-            FROM home_sales 
-            WHERE bedrooms = 3 AND bathrooms = 3 AND floors = 2 AND sqft_living >= 2000
-            GROUP BY date_built 
-            ORDER BY date_built
-        """,
-        
-        "avg_price_by_view_rating": """
-            SELECT view, ROUND(AVG(price), 2) as avg_price
-            FROM home_sales 
-            WHERE price >= 350000
-            GROUP BY view 
-            ORDER BY view DESC
-        """
-    }
-    
+def warmup(spark, col, avg, count, spark_round):
+    """Run each query once, untimed, so analysis and codegen costs don't skew the baseline"""
+    print("\n🔥 Warming up query plans...")
+    for query_name, sql in QUERIES.items():
+        try:
+            spark.sql(sql).collect()
+        except Exception as e:
+            print(f"   ⚠️  Warm-up of {query_name} failed: {e}")
+    print("✅ Warm-up complete")
+
+def build_query_plans(spark, queries=QUERIES):
+    """Parse and analyze each query once against the current home_sales view"""
+    return {query_name: spark.sql(sql) for query_name, sql in queries.items()}
+
+def time_concurrent_passes(runners):
+    """Time repeated passes of concurrently executed queries
+
+    runners maps each query name to a callable that executes the query once.
+    Returns the median per-query latency and the median wall-clock time of a pass.
+    """
+    iterations = bench_iterations()
+
+    def _once(run):
+        start_time = time.perf_counter()
+        run()
+        return time.perf_counter() - start_time
+
+    samples = {query_name: [] for query_name in runners}
+    pass_times = []
+
+    # The queries are independent, so each pass submits them together and lets
+    # the engine interleave them; passes run in lockstep so every pass is
+    # timed on its own
+    print(f"🔍 Running {len(runners)} queries concurrently "
+          f"(median of {iterations} passes)...")
+    with ThreadPoolExecutor(max_workers=len(runners)) as executor:
+        for _ in range(iterations):
+            pass_start = time.perf_counter()
+            futures = {
+                query_name: executor.submit(_once, run)
+                for query_name, run in runners.items()
+            }
+            for query_name, future in futures.items():
+                samples[query_name].append(future.result())
+            pass_times.append(time.perf_counter() - pass_start)
+
+    # Median of several runs damps one-off scheduling and GC noise.
+    # Per-query numbers are latencies measured while the other queries run
     results = {}
-    
-    for query_name, sql in queries.items():
-        print(f"🔍 Running {query_name}...")
-        start_time = time.time()
-        
-        result_df = spark.sql(sql)
-        # Force execution by collecting results
-        result_df.collect()
-        
-        end_time = time.time()
-        execution_time = end_time - start_time
+    for query_name, query_samples in samples.items():
+        execution_time = statistics.median(query_samples)
         results[query_name] = execution_time
-        print(f"   ⏱️  {execution_time:.3f} seconds")
-    
-    return results
+        print(f"   ⏱️  {query_name}: {execution_time:.3f} seconds (concurrent latency)")
+    wall_time = statistics.median(pass_times)
+    print(f"   ⏱️  Wall clock per pass: {wall_time:.3f} seconds")
+    return results, wall_time
 
-def benchmark_scenario(spark, df, scenario_name, setup_func=None):
-    """Benchmark a specific scenario (CSV cached/uncached, Parquet cached/uncached)"""
+def run_benchmark_queries(spark, query_plans, col, avg, count, spark_round):
+    """Run realistic home sales analysis queries"""
+
+    def _runner(query_name, result_df):
+        def run():
+            # One pool per query, so the FAIR scheduler splits executors between the
+            # concurrent jobs (jobs inside a single default pool queue FIFO)
+            spark.sparkContext.setLocalProperty("spark.scheduler.pool", query_name)
+            # Force execution with a noop sink so no rows are shipped to the driver
+            result_df.write.format("noop").mode("overwrite").save()
+        return run
+
+    return time_concurrent_passes(
+        {query_name: _runner(query_name, result_df) for query_name, result_df in query_plans.items()}
+    )
+
+def _rows_match(rows, expected):
+    """Compare result rows, allowing a cent of drift in rounded averages"""
+    if len(rows) != len(expected):
+        return False
+    for row, expected_row in zip(rows, expected):
+        for value, expected_value in zip(row, expected_row):
+            if isinstance(value, float) and isinstance(expected_value, float):
+                # Summation order differs between formats, which can move ROUND(..., 2)
+                if not math.isclose(value, expected_value, abs_tol=0.011):
+                    return False
+            elif value != expected_value:
+                return False
+    return True
+
+def verify_results(query_plans, reference_rows):
+    """Collect each query's rows (untimed) and compare them with the reference
+
+    The first scenario to run a query records its rows as the reference.
+    """
+    for query_name, result_df in query_plans.items():
+        rows = [tuple(row) for row in result_df.collect()]
+        if query_name not in reference_rows:
+            reference_rows[query_name] = rows
+            print(f"   📌 {query_name}: recorded {len(rows)} reference rows")
+        elif _rows_match(rows, reference_rows[query_name]):
+            print(f"   ✔️  {query_name}: {len(rows)} rows match the reference")
+        else:
+            print(f"   ❌ {query_name}: {len(rows)} rows differ from the "
+                  f"{len(reference_rows[query_name])} reference rows")
+
+def benchmark_scenario(spark, df, scenario_name, funcs, query_plans, setup_func=None,
+                       fused_plans=None, reference_rows=None):
+    """Benchmark a specific scenario (CSV cached/uncached, Parquet cached/uncached)
+
+    query_plans (and fused_plans, if given) are rebuilt in place when the setup
+    step reports (by returning True) that it rebound the home_sales view.
+    When BENCH_VERIFY is set, results are checked against reference_rows.
+    """
     print(f"\n🚀 Benchmarking: {scenario_name}")
     print("=" * 50)
 
     # Setup for this scenario (caching, parquet conversion, etc.)
-    if setup_func:
-        setup_func(spark, df)
+    if setup_func and setup_func(spark, df):
+        query_plans.update(build_query_plans(spark))
+        if fused_plans is not None:
+            fused_plans.update(build_query_plans(spark, FUSED_QUERIES))
 
-    # Run all queries and collect timings
-    _, col, avg, count, spark_round = setup_spark()
-    results = run_benchmark_queries(spark, col, avg, count, spark_round)
+    # Run all queries and collect timings (reuse the session's function handles)
+    results, wall_time = run_benchmark_queries(spark, query_plans, *funcs)
 
-    # Add scenario name to results
+    # Add scenario name to results; the wall clock is the scenario total
     scenario_results = {f"{scenario_name}_{query}": time_val for query, time_val in results.items()}
+    scenario_results[f"{scenario_name}_{WALL_KEY}"] = wall_time
+
+    # Optionally time the fused query set for comparison with the separate queries
+    if fused_plans:
+        print("🔗 Fused queries:")
+        _, fused_wall_time = run_benchmark_queries(spark, fused_plans, *funcs)
+        scenario_results[f"{scenario_name}_{FUSED_KEY}"] = fused_wall_time
+
+    # Optional untimed correctness check against the first scenario's results
+    if os.environ.get("BENCH_VERIFY") and reference_rows is not None:
+        print("🔎 Verifying results...")
+        verify_results({**query_plans, **(fused_plans or {})}, reference_rows)
+
     return scenario_results
 
+def cache_home_sales(spark):
+    """Persist the home_sales view off-heap and materialize the cache"""
+    from pyspark import StorageLevel
+
+    # Off-heap memory only: cached batches stay out of GC, and unlike
+    # StorageLevel.OFF_HEAP (which allows disk) nothing can spill to disk
+    level = StorageLevel(False, True, True, False, 1)
+    table = spark.table("home_sales")
+    table.persist(level)
+
+    # Trigger caching by scanning every partition into the noop sink, with no
+    # aggregation and no rows sent to Python
+    table.write.format("noop").mode("overwrite").save()
+
+    # persist() keeps an existing cache entry's level, so confirm ours applied
+    if table.storageLevel != level:
+        print(f"⚠️  home_sales cached as {table.storageLevel}, expected {level}")
+
+    # Confirm the scan actually filled the cache (callers clear it beforehand)
+    cached_rdds = [info for info in spark.sparkContext._jsc.sc().getRDDStorageInfo()
+                   if info.numCachedPartitions() > 0]
+    if not cached_rdds:
+        print("⚠️  home_sales cache was not materialized")
+    elif any(info.numCachedPartitions() < info.numPartitions() for info in cached_rdds):
+        print("⚠️  home_sales is only partially cached")
+
 def setup_csv_cached(spark, df):
     """Setup for CSV cached scenario"""
     print("💾 Caching CSV data...")
-    spark.catalog.cacheTable("home_sales")
-    # Trigger caching by running a simple query
-    spark.sql("SELECT COUNT(*) FROM home_sales").collect()
+    cache_home_sales(spark)
     print("✅ CSV data cached")
 
-def setup_parquet_uncached(spark, df):
-    """Setup for Parquet uncached scenario"""
-    parquet_path = "_parquet_cache/home_sales_partitioned"
+def ensure_parquet(df, parquet_path=PARQUET_PATH, force_rewrite=False):
+    """Convert the CSV data to Parquet once, reusing a previously completed write"""
+    if not force_rewrite and os.path.exists(os.path.join(parquet_path, "_SUCCESS")):
+        print(f"♻️  Reusing existing Parquet data: {parquet_path}")
+        return parquet_path
 
     print(f"💿 Writing data to Parquet format: {parquet_path}")
-    # Partition by date_built for better query performance
-    df.write.mode("overwrite").partitionBy("date_built").parquet(parquet_path)
+    # Unpartitioned: every query scans all years, so date_built partitions
+    # would only add small-file overhead without ever being pruned
+    df.write.mode("overwrite") \
+        .option("parquet.block.size", 128 * 1024 * 1024) \
+        .parquet(parquet_path)
+    return parquet_path
 
-    # Read parquet data and create new temp view
-    parquet_df = spark.read.parquet(parquet_path)
+def setup_parquet_uncached(spark, df):
+    """Setup for Parquet uncached scenario"""
+    # Drop any cached data and plans tied to the previous view
+    spark.catalog.clearCache()
+
+    # Read the Parquet copy written by ensure_parquet and create new temp view
+    parquet_df = spark.read.parquet(PARQUET_PATH)
     parquet_df.createOrReplaceTempView("home_sales")
     print("✅ Parquet data loaded (uncached)")
+    return True
 
 def setup_parquet_cached(spark, df):
     """Setup for Parquet cached scenario"""
     setup_parquet_uncached(spark, df)
     print("💾 Caching Parquet data...")
-    spark.catalog.cacheTable("home_sales")
-    # Trigger caching
-    spark.sql("SELECT COUNT(*) FROM home_sales").collect()
+    cache_home_sales(spark)
     print("✅ Parquet data cached")
+    return True
+
+# Setup step run before each scenario's queries
+SCENARIO_SETUPS = {
+    "csv_uncached": None,
+    "csv_cached": setup_csv_cached,
+    "parquet_uncached": setup_parquet_uncached,
+    "parquet_cached": setup_parquet_cached,
+}
+
+def scenario_report_path(scenario_name):
+    """Per-scenario results file written by --scenario runs"""
+    return f"reports/benchmarks.{scenario_name}.csv"
+
+def run_scenarios_parallel(csv_path, args):
+    """Run each scenario in its own process and Spark session, then merge the results"""
+    # Write the shared Parquet copy first so the workers never race on it
+    spark, *_ = setup_spark()
+    try:
+        ensure_parquet(load_data(spark, csv_path), force_rewrite=args.force_rewrite)
+    finally:
+        spark.stop()
+
+    env = dict(os.environ, HOME_SALES_CSV=os.path.abspath(csv_path))
+
+    def _run(scenario_name):
+        cmd = [sys.executable, os.path.abspath(__file__), f"--scenario={scenario_name}"]
+        if args.fused:
+            cmd.append("--fused")
+        return subprocess.run(cmd, env=env, capture_output=True, text=True)
+
+    # Threads only wait on the child processes, which do the actual work
+    print(f"\n🚀 Launching {len(SCENARIOS)} scenarios in parallel...")
+    with ThreadPoolExecutor(max_workers=len(SCENARIOS)) as executor:
+        completed = dict(zip(SCENARIOS, executor.map(_run, SCENARIOS)))
+
+    for scenario_name, proc in completed.items():
+        print(f"\n📜 Output from {scenario_name}:")
+        print(proc.stdout)
+        if proc.returncode != 0:
+            raise RuntimeError(f"Scenario {scenario_name} failed: {proc.stderr.strip()}")
+
+    return load_results([scenario_report_path(name) for name in SCENARIOS])
+
+def _sql_string(value):
+    """Quote a value as a SQL string literal"""
+    return "'" + value.replace("'", "''") + "'"
+
+def run_duckdb(csv_path, force_rewrite=False):
+    """Run the benchmark queries on DuckDB for a single-node comparison with Spark
 
-def save_results(all_results):
+    The cached scenarios load the data into an in-memory DuckDB table.
+    """
+    try:
+        import duckdb
+    except ImportError:
+        print("❌ DuckDB not available. Please install DuckDB or use the default Spark engine.")
+        print("💡 Run: pip install duckdb")
+        sys.exit(1)
+
+    con = duckdb.connect()
+
+    # DuckDB writes its own Parquet copy so this mode never needs Spark
+    parquet_path = os.path.join(os.path.dirname(PARQUET_PATH), "home_sales_duckdb.parquet")
+    csv_source = f"read_csv_auto({_sql_string(csv_path)})"
+    parquet_source = f"read_parquet({_sql_string(parquet_path)})"
+    if force_rewrite or not os.path.exists(parquet_path):
+        print(f"💿 Writing data to Parquet format: {parquet_path}")
+        os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
+        # Write to a temporary file and rename, so an interrupted COPY is never reused
+        tmp_path = parquet_path + ".part"
+        try:
+            con.execute(f"COPY (SELECT * FROM {csv_source}) "
+                        f"TO {_sql_string(tmp_path)} (FORMAT PARQUET)")
+            os.replace(tmp_path, parquet_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    else:
+        print(f"♻️  Reusing existing Parquet data: {parquet_path}")
+
+    # (object kind, source) per scenario: views re-read the file, tables hold it in memory
+    sources = {
+        "csv_uncached": ("VIEW", csv_source),
+        "csv_cached": ("TABLE", csv_source),
+        "parquet_uncached": ("VIEW", parquet_source),
+        "parquet_cached": ("TABLE", parquet_source),
+    }
+
+    all_results = {}
+    previous_kind = None
+    for scenario_name in SCENARIOS:
+        print(f"\n🦆 Benchmarking (DuckDB): {scenario_name}")
+        print("=" * 50)
+
+        # Views and tables share a namespace, so drop whatever the last scenario made
+        kind, source = sources[scenario_name]
+        if previous_kind:
+            con.execute(f"DROP {previous_kind} home_sales")
+        con.execute(f"CREATE {kind} home_sales AS SELECT * FROM {source}")
+        previous_kind = kind
+
+        # Timed exactly like the Spark path: concurrent lockstep passes, one
+        # cursor per query, and COUNT(*) so no result rows become Python objects
+        cursors = {query_name: con.cursor() for query_name in QUERIES}
+
+        def _runner(query_name, sql):
+            counted_sql = f"SELECT COUNT(*) FROM ({sql})"
+            return lambda: cursors[query_name].execute(counted_sql).fetchone()
+
+        runners = {query_name: _runner(query_name, sql) for query_name, sql in QUERIES.items()}
+        # Untimed first run, matching the Spark warm-up
+        for run in runners.values():
+            run()
+
+        results, wall_time = time_concurrent_passes(runners)
+        for query_name, execution_time in results.items():
+            all_results[f"{scenario_name}_{query_name}"] = execution_time
+        all_results[f"{scenario_name}_{WALL_KEY}"] = wall_time
+
+        for cursor in cursors.values():
+            cursor.close()
+
+    con.close()
+    return all_results
+
+def save_results(all_results, output_file="reports/benchmarks.csv", scenarios=SCENARIOS):
     """Save benchmark results to CSV file"""
 
     # Ensure reports directory exists
-    os.makedirs("reports", exist_ok=True)
-    output_file = "reports/benchmarks.csv"
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
 
     print(f"\n💾 Saving results to {output_file}")
 
-    if HAS_PANDAS:
-        # Use pandas for nice formatting
-        df_results = pd.DataFrame([all_results])
-        df_results.to_csv(output_file, index=False)
-    else:
-        # Fallback to basic CSV writing
-        with open(output_file, 'w', newline='') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=all_results.keys())
+    # One row per scenario, one column per query (plus wall clock / fused totals if run)
+    queries = list(QUERIES)
+    for extra_key in (WALL_KEY, FUSED_KEY):
+        if any(key.endswith(f"_{extra_key}") for key in all_results):
+            queries.append(extra_key)
+    # Measurements that were not taken are left empty rather than written as 0
+    rows = [
+        {"scenario": scenario,
+         **{query: all_results.get(f"{scenario}_{query}") for query in queries}}
+        for scenario in scenarios
+    ]
+
+    # Large write buffer so the whole report is flushed in one pass
+    with open(output_file, 'w', newline='', buffering=1 << 20) as csvfile:
+        if HAS_PANDAS:
+            # Use pandas for nice formatting
+            pd.DataFrame(rows).to_csv(csvfile, index=False)
+        else:
+            # Fallback to basic CSV writing
+            writer = csv.DictWriter(csvfile, fieldnames=["scenario", *queries])
             writer.writeheader()
-            writer.writerow(all_results)
+            writer.writerows(rows)
 
     print(f"✅ Results saved to {output_file}")
 
-def display_comparison_table(all_results):
+def load_results(paths):
+    """Merge results files written by save_results back into a flat results dict"""
+    if HAS_PANDAS:
+        frames = [pd.read_csv(path, float_precision="round_trip") for path in paths]
+        records = pd.concat(frames, ignore_index=True).to_dict("records")
+        records = [{key: val for key, val in record.items() if pd.notna(val)}
+                   for record in records]
+    else:
+        records = []
+        for path in paths:
+            with open(path, newline='') as csvfile:
+                records.extend(csv.DictReader(csvfile))
+
+    # Empty cells are measurements that were not taken
+    return {
+        f"{record['scenario']}_{query}": float(time_val)
+        for record in records
+        for query, time_val in record.items()
+        if query != "scenario" and time_val != ""
+    }
+
+def _scenario_totals(all_results, scenarios, queries):
+    """Build per-query times and per-scenario totals from the flat results dict"""
+    if HAS_PANDAS:
+        # Split "<scenario>_<query>" keys once and pivot into a query x scenario table
+        times = pd.Series(all_results, dtype=float).rename_axis("key").reset_index(name="seconds")
+        pattern = "^(" + "|".join(sorted(scenarios, key=len, reverse=True)) + ")_(.+)$"
+        times[["scenario", "query"]] = times["key"].str.extract(pattern)
+        table = times.dropna(subset=["scenario"]) \
+            .pivot(index="query", columns="scenario", values="seconds") \
+            .reindex(index=queries, columns=scenarios) \
+            .fillna(0.0)
+        return table, table.sum(axis=0).to_dict()
+
+    totals = {
+        scenario: sum(all_results.get(f"{scenario}_{query}", 0.0) for query in queries)
+        for scenario in scenarios
+    }
+    return None, totals
+
+def display_comparison_table(all_results, engine="Spark"):
     """Display a formatted comparison table of results"""
 
-    print("\n📊 PERFORMANCE COMPARISON")
+    print(f"\n📊 PERFORMANCE COMPARISON ({engine})")
     print("=" * 80)
 
     # Extract scenarios and queries
-    scenarios = ["csv_uncached", "csv_cached", "parquet_uncached", "parquet_cached"]
-    queries = ["avg_price_4bed_by_year", "avg_price_3bed_3bath_by_year",
-               "avg_price_luxury_homes", "avg_price_by_view_rating"]
+    scenarios = SCENARIOS
+    queries = list(QUERIES)
+
+    table, totals = _scenario_totals(all_results, scenarios, queries)
+
+    # Concurrent runs record a wall-clock total; per-query times are then
+    # overlapping latencies and must not be summed
+    concurrent = False
+    for scenario in scenarios:
+        wall_time = all_results.get(f"{scenario}_{WALL_KEY}")
+        if wall_time is not None:
+            totals[scenario] = wall_time
+            concurrent = True
 
     # Print header
     print(f"{'Query':<30} {'CSV':<12} {'CSV':<12} {'Parquet':<12} {'Parquet':<12}")
@@ -242,29 +652,35 @@ def display_comparison_table(all_results):
     print("-" * 80)
 
     # Print results for each query
-    for query in queries:
-        row = f"{query:<30}"
-        for scenario in scenarios:
-            key = f"{scenario}_{query}"
-            time_val = all_results.get(key, 0.0)
-            row += f"{time_val:<12.3f}"
-        print(row)
+    if table is not None:
+        for query, times in table.iterrows():
+            print(f"{query:<30}" + "".join(f"{time_val:<12.3f}" for time_val in times))
+    else:
+        for query in queries:
+            row = f"{query:<30}"
+            for scenario in scenarios:
+                key = f"{scenario}_{query}"
+                time_val = all_results.get(key, 0.0)
+                row += f"{time_val:<12.3f}"
+            print(row)
 
     print("-" * 80)
 
-    # Calculate and display totals
-    totals_row = f"{'TOTAL':<30}"
+    # Display totals
+    totals_label = "TOTAL (wall clock)" if concurrent else "TOTAL"
+    totals_row = f"{totals_label:<30}"
     for scenario in scenarios:
-        total_time = sum(all_results.get(f"{scenario}_{query}", 0.0) for query in queries)
-        totals_row += f"{total_time:<12.3f}"
+        totals_row += f"{totals[scenario]:<12.3f}"
     print(totals_row)
+    if concurrent:
+        print("   Per-query times are latencies measured while the queries run concurrently")
 
     # Performance insights
     print("\n💡 INSIGHTS:")
-    csv_uncached_total = sum(all_results.get(f"csv_uncached_{query}", 0.0) for query in queries)
-    csv_cached_total = sum(all_results.get(f"csv_cached_{query}", 0.0) for query in queries)
-    parquet_uncached_total = sum(all_results.get(f"parquet_uncached_{query}", 0.0) for query in queries)
-    parquet_cached_total = sum(all_results.get(f"parquet_cached_{query}", 0.0) for query in queries)
+    csv_uncached_total = totals["csv_uncached"]
+    csv_cached_total = totals["csv_cached"]
+    parquet_uncached_total = totals["parquet_uncached"]
+    parquet_cached_total = totals["parquet_cached"]
 
     if csv_cached_total > 0:
         cache_speedup = csv_uncached_total / csv_cached_total
@@ -278,49 +694,117 @@ def display_comparison_table(all_results):
         best_speedup = csv_uncached_total / parquet_cached_total
         print(f"   ⚡ Best case (Parquet + Cache): {best_speedup:.1f}x faster than baseline")
 
+    # Fused single-scan queries vs the separate queries, when measured
+    for scenario in scenarios:
+        fused_total = all_results.get(f"{scenario}_{FUSED_KEY}")
+        if fused_total is not None:
+            delta = fused_total - totals[scenario]
+            print(f"   🔗 Fused ({scenario}): {fused_total:.3f}s vs "
+                  f"{totals[scenario]:.3f}s separate ({delta:+.3f}s)")
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Home Sales Performance Benchmark")
+    parser.add_argument("--force-rewrite", action="store_true",
+                        help="Rewrite the Parquet cache even if a previous write completed")
+    parser.add_argument("--fused", action="store_true",
+                        help="Also time the date_built queries fused into a single scan")
+    parser.add_argument("--engine", choices=["spark", "duckdb"], default="spark",
+                        help="Query engine to benchmark (default: spark)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--scenario", choices=SCENARIOS,
+                      help="Run a single scenario and save it to reports/benchmarks.<scenario>.csv")
+    mode.add_argument("--parallel", action="store_true",
+                      help="Run each scenario in its own Spark session concurrently "
+                           "(faster, but the sessions compete for CPU)")
+    args = parser.parse_args()
+
+    # These options only apply to the Spark engine
+    if args.engine == "duckdb":
+        spark_only = [flag for flag, value in (("--fused", args.fused),
+                                                ("--scenario", args.scenario),
+                                                ("--parallel", args.parallel)) if value]
+        if spark_only:
+            parser.error(f"{', '.join(spark_only)} not supported with --engine=duckdb")
+    return args
+
 def main():
     """Main benchmark execution function"""
+    args = parse_args()
+
     print("🏠 Home Sales Performance Benchmark")
     print("=" * 50)
 
     # Find and validate CSV file
     csv_path = find_csv_file()
 
+    # Single-node DuckDB comparison, no Spark session needed
+    if args.engine == "duckdb":
+        output_file = "reports/benchmarks_duckdb.csv"
+        all_results = run_duckdb(csv_path, force_rewrite=args.force_rewrite)
+        save_results(all_results, output_file)
+        display_comparison_table(all_results, engine="DuckDB")
+
+        print("\n✅ Benchmark completed successfully!")
+        print(f"📊 Results saved to {output_file}")
+        return
+
+    # One Spark session per scenario, merged afterwards
+    if args.parallel:
+        try:
+            all_results = run_scenarios_parallel(csv_path, args)
+        except Exception as e:
+            print(f"\n❌ Benchmark failed: {e}")
+            sys.exit(1)
+
+        output_file = "reports/benchmarks.csv"
+        save_results(all_results, output_file)
+        display_comparison_table(all_results)
+
+        print("\n✅ Benchmark completed successfully!")
+        print(f"📊 Results saved to {output_file}")
+        return
+
+    scenarios = [args.scenario] if args.scenario else SCENARIOS
+    output_file = scenario_report_path(args.scenario) if args.scenario else "reports/benchmarks.csv"
+
     # Setup Spark
     spark, col, avg, count, spark_round = setup_spark()
+    funcs = (col, avg, count, spark_round)
 
     try:
         # Load initial data
         df = load_data(spark, csv_path)
 
-        # Run all benchmark scenarios
-        all_results = {}
-
-        # Scenario 1: CSV Uncached (baseline)
-        scenario_results = benchmark_scenario(spark, df, "csv_uncached")
-        all_results.update(scenario_results)
-
-        # Scenario 2: CSV Cached
-        scenario_results = benchmark_scenario(spark, df, "csv_cached", setup_csv_cached)
-        all_results.update(scenario_results)
+        # Convert to Parquet once up front; the Parquet scenarios only read it
+        if any(name.startswith("parquet") for name in scenarios):
+            ensure_parquet(df, force_rewrite=args.force_rewrite)
 
-        # Uncache before parquet tests
-        spark.catalog.uncacheTable("home_sales")
+        # Warm up the JVM/codegen before the first timed scenario
+        warmup(spark, *funcs)
 
-        # Scenario 3: Parquet Uncached
-        scenario_results = benchmark_scenario(spark, df, "parquet_uncached", setup_parquet_uncached)
-        all_results.update(scenario_results)
+        # Analyze each query once; rebuilt only when the view is rebound
+        query_plans = build_query_plans(spark)
+        fused_plans = build_query_plans(spark, FUSED_QUERIES) if args.fused else None
 
-        # Scenario 4: Parquet Cached
-        scenario_results = benchmark_scenario(spark, df, "parquet_cached", setup_parquet_cached)
-        all_results.update(scenario_results)
-
-        # Save and display results
-        save_results(all_results)
-        display_comparison_table(all_results)
+        # Run the benchmark scenarios in order; the Parquet setups clear the
+        # CSV cache before rebinding the view
+        all_results = {}
+        reference_rows = {}
+        for scenario_name in scenarios:
+            scenario_results = benchmark_scenario(spark, df, scenario_name, funcs, query_plans,
+                                                  SCENARIO_SETUPS[scenario_name],
+                                                  fused_plans=fused_plans,
+                                                  reference_rows=reference_rows)
+            all_results.update(scenario_results)
+
+        # Save and display results (a single scenario has nothing to compare)
+        save_results(all_results, output_file, scenarios)
+        if not args.scenario:
+            display_comparison_table(all_results)
 
         print("\n✅ Benchmark completed successfully!")
-        print(f"📊 Results saved to reports/benchmarks.csv")
+        print(f"📊 Results saved to {output_file}")
 
     except Exception as e:
         print(f"\n❌ Benchmark failed: {e}")